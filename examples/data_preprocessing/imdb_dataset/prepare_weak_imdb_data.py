@@ -80,16 +80,19 @@ imdb_dataset_raw[COLUMN_WITH_TEXT] = imdb_dataset_raw[COLUMN_WITH_TEXT].apply(
 # 
 # After parsing the keywords from separate files, they are stored in a pd.DataFrame with the corresponding sentiment as "label".
 
-positive_keywords = pd.read_csv(os.path.join(data_path, "positive-words.txt"), sep=" ", header=None, error_bad_lines=False, skiprows=30)
-positive_keywords.columns = ["keyword"]
-positive_keywords["label"] = "positive"
-
-negative_keywords = pd.read_csv(os.path.join(data_path, "negative-words.txt"),
-                                sep=" ", header=None, error_bad_lines=False,  encoding='latin-1', skiprows=30)
-negative_keywords.columns = ["keyword"]
-negative_keywords["label"] = "negative"
-
-all_keywords = pd.concat([positive_keywords, negative_keywords])
+def load_keywords(filename: str, label: str, **read_csv_kwargs) -> pd.DataFrame:
+    # naming the column at read time and assigning the label in the same chain avoids the
+    # intermediate frames a read -> set columns -> set label sequence would create
+    return pd.read_csv(
+        os.path.join(data_path, filename), sep=" ", header=None, error_bad_lines=False, skiprows=30,
+        names=["keyword"], **read_csv_kwargs
+    ).assign(label=label)
+
+all_keywords = pd.concat(
+    [load_keywords("positive-words.txt", "positive"),
+     load_keywords("negative-words.txt", "negative", encoding='latin-1')],
+    ignore_index=True
+)
 all_keywords.label.value_counts()
 
 # remove overlap of keywords between two sentiments
@@ -181,8 +184,8 @@ examples = imdb_dataset_raw.iloc[applied_lfs[:, 1110] == POSITIVE].loc[:2, [COLU
 print("This keyword has matched the following instances with labels:")
 print()
 
-for idx, ex in examples.iterrows():
-    print("{} - {}".format(ex.sentiment, ex[COLUMN_WITH_TEXT]))
+for ex in examples.itertuples(index=False):
+    print("{} - {}".format(ex.sentiment, getattr(ex, COLUMN_WITH_TEXT)))
     print()
 
     
@@ -246,8 +246,7 @@ def get_conll_data_with_ent_pairs(
 def get_t_matrix(lfs: pd.DataFrame, num_labels: int) -> np.ndarray:
     """ Function calculates t matrix (rules x labels) using the known correspondence of relations to decision rules """
     rule_assignments_t = np.empty([lfs.rule_id.max() + 1, num_labels])
-    for index, row in lfs.iterrows():
-        rule_assignments_t[row["rule_id"], row["label_id"]] = 1
+    rule_assignments_t[lfs["rule_id"].to_numpy(), lfs["label_id"].to_numpy()] = 1
     return rule_assignments_t
 
 
@@ -1,11 +1,16 @@
 import argparse
+import copy
+import math
 import os
-import statistics
 import sys
 import json
 from itertools import product
+from typing import List, Tuple
 
-from torch import Tensor, LongTensor
+import numpy as np
+import torch
+from joblib import Parallel, delayed
+from torch import LongTensor
 from torch.nn import CrossEntropyLoss
 from torch.optim import Adam
 from torch.utils.data import TensorDataset
@@ -17,92 +22,257 @@ from knodle.trainer.cleanlab.cleanlab import CleanLabTrainer
 from knodle.trainer.cleanlab.config import CleanLabConfig
 
 
-def train_cleanlab(path_to_data: str) -> None:
+class Welford:
+    """ Running mean/variance accumulator (Welford's algorithm): the statistics are updated with one pass over the
+    accuracies as they arrive, instead of two list traversals per configuration """
+
+    def __init__(self):
+        self.n, self.mean, self.M2 = 0, 0.0, 0.0
+
+    def add(self, value: float) -> None:
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.M2 += delta * (value - self.mean)
+
+    @property
+    def std(self) -> float:
+        """ Sample standard deviation over the values seen so far """
+        return math.sqrt(self.M2 / (self.n - 1))
+
+
+def calculate_psx_once(
+        psx_calculation_method: str, cv_n_folds: int, base_model, train_input_x, train_rule_matches_z,
+        mapping_rules_labels_t, num_classes: int, lr: float, epochs: int, batch_size: int
+) -> np.ndarray:
+    """ Estimates the out-of-sample predicted probabilities for one (psx_calculation_method, cv_n_folds) pair """
+    train_features_dataset = TensorDataset(torch.from_numpy(train_input_x.astype(np.float32).toarray()))
+
+    config = CleanLabConfig(
+        cv_n_folds=cv_n_folds,
+        output_classes=num_classes,
+        optimizer=Adam,
+        criterion=CrossEntropyLoss,
+        lr=lr,
+        epochs=epochs,
+        batch_size=batch_size,
+        psx_calculation_method=psx_calculation_method,
+        use_probabilistic_labels=False
+    )
+    trainer = CleanLabTrainer(
+        model=copy.deepcopy(base_model),
+        mapping_rules_labels_t=mapping_rules_labels_t,
+        model_input_x=train_features_dataset,
+        rule_matches_z=train_rule_matches_z,
+        trainer_config=config
+    )
+    return trainer.calculate_psx()
+
+
+def run_experiment(
+        config_tuple: Tuple, exp_id: int, base_model, train_input_x, test_input_x, test_labels: List,
+        train_rule_matches_z, mapping_rules_labels_t, num_classes: int, psx: np.ndarray = None
+) -> float:
+    """ Runs a single cleanlab training with one hyperparameter combination and returns the test accuracy """
+    psx_calculation_method, cv_n_folds, prune_method, epochs, batch_size, lr = config_tuple
+
+    params = f'seed = None lr = {lr} cv_n_folds = {cv_n_folds} prune_method = {prune_method} epochs = {epochs} ' \
+             f'batch_size = {batch_size} psx_calculation_method = {psx_calculation_method}'
+    print(f"Experiment {exp_id} with parameters: {params}")
+
+    # the TF-IDF matrices stay sparse up to this point; the dense float32 tensors the trainer needs are written
+    # in one pass, without an intermediate float64 densification
+    train_features_dataset = TensorDataset(torch.from_numpy(train_input_x.astype(np.float32).toarray()))
+    test_features_dataset = TensorDataset(torch.from_numpy(test_input_x.astype(np.float32).toarray()))
+    test_labels_dataset = TensorDataset(LongTensor(test_labels))
+
+    # each experiment trains a fresh copy of the model constructed once in the parent process; its parameters are
+    # re-initialized so that the repetitions still measure the variance across random initializations
+    model = copy.deepcopy(base_model)
+    for module in model.modules():
+        if hasattr(module, "reset_parameters"):
+            module.reset_parameters()
+
+    custom_cleanlab_config = CleanLabConfig(
+        # seed=seed,
+        cv_n_folds=cv_n_folds,
+        output_classes=num_classes,
+        optimizer=Adam,
+        criterion=CrossEntropyLoss,
+        lr=lr,
+        epochs=epochs,
+        batch_size=batch_size,
+        psx_calculation_method=psx_calculation_method,
+        prune_method=prune_method,
+        use_probabilistic_labels=False
+    )
+    trainer = CleanLabTrainer(
+        model=model,
+        mapping_rules_labels_t=mapping_rules_labels_t,
+        model_input_x=train_features_dataset,
+        rule_matches_z=train_rule_matches_z,
+        trainer_config=custom_cleanlab_config
+    )
+
+    trainer.train(psx=psx)
+    clf_report, _ = trainer.test(test_features_dataset, test_labels_dataset)
+    print(f"Accuracy is: {clf_report['accuracy']}")
+    print(clf_report)
+
+    return clf_report['accuracy']
+
+
+def train_cleanlab(path_to_data: str, n_jobs: int = None) -> None:
     """ This is an example of launching cleanlab trainer """
 
     num_experiments = 10
 
+    # the dimensions psx depends on come first, so that adjacent grid points share the cached psx and warm state;
+    # the purely training-related parameters vary innermost
     parameters = dict(
         # seed=None,
-        lr=[0.1],
+        psx_calculation_method=['signatures', 'rules', 'random'],       # how the splitting into folds will be performed
         cv_n_folds=[3, 5, 8],
         prune_method=['prune_by_class', 'prune_by_noise_rate', 'both'],
         epochs=[200],
         batch_size=[128],
-        psx_calculation_method=['signatures', 'rules', 'random'],       # how the splitting into folds will be performed
+        lr=[0.1],
     )
     parameter_values = [v for v in parameters.values()]
 
+    # let cuDNN autotune its kernels once for the fixed input shapes; later iterations reuse the tuned kernels
+    torch.backends.cudnn.benchmark = True
+
     df_train, df_dev, df_test, train_rule_matches_z, _, mapping_rules_labels_t = read_train_dev_test(path_to_data)
 
     train_input_x, test_input_x, _ = get_tfidf_features(df_train["sample"], test_data=df_test["sample"])
 
-    train_features_dataset = TensorDataset(Tensor(train_input_x.toarray()))
-    test_features_dataset = TensorDataset(Tensor(test_input_x.toarray()))
-
     test_labels = df_test["label"].tolist()
-    test_labels_dataset = TensorDataset(LongTensor(test_labels))
-
     num_classes = max(test_labels) + 1
 
+    configurations = list(product(*parameter_values))
+
+    # the model is built once here; every experiment starts from a deep copy of it instead of constructing it anew
+    base_model = LogisticRegressionModel(train_input_x.shape[1], num_classes)
+
+    # psx does not depend on the prune method, so it is estimated once per combination of the splitting method,
+    # the number of folds and the fold-model training hyperparameters, and shared by the configurations that only
+    # differ in the remaining dimensions. Keying the cache by all psx-relevant values keeps it correct even when
+    # the lr/epochs/batch_size lists are widened.
+    psx_cache = {
+        (psx_method, cv_n_folds, lr, epochs, batch_size): calculate_psx_once(
+            psx_method, cv_n_folds, base_model, train_input_x, train_rule_matches_z, mapping_rules_labels_t,
+            num_classes, lr, epochs, batch_size
+        )
+        for psx_method, cv_n_folds, lr, epochs, batch_size in product(
+            parameters["psx_calculation_method"], parameters["cv_n_folds"], parameters["lr"],
+            parameters["epochs"], parameters["batch_size"]
+        )
+    }
+
+    # each configuration x experiment is independent of the others, so they are trained in parallel worker processes
+    accuracies = Parallel(n_jobs=n_jobs if n_jobs else os.cpu_count(), backend="loky")(
+        delayed(run_experiment)(
+            config, exp_id, base_model, train_input_x, test_input_x, test_labels, train_rule_matches_z,
+            mapping_rules_labels_t, num_classes,
+            # config is ordered (psx_method, cv_n_folds, prune_method, epochs, batch_size, lr)
+            psx=psx_cache[(config[0], config[1], config[5], config[3], config[4])]
+        )
+        for config in configurations for exp_id in range(0, num_experiments)
+    )
+
     results = []
-    for run_id, (lr, cv_n_folds, prune_method, epochs, batch_size, psx_calculation_method) in \
-            enumerate(product(*parameter_values)):
-
-        print("======================================")
-        params = f'seed = None lr = {lr} cv_n_folds = {cv_n_folds} prune_method = {prune_method} epochs = {epochs} ' \
-                 f'batch_size = {batch_size} psx_calculation_method = {psx_calculation_method}'
-        print(f"Parameters: {params}")
-        print("======================================")
-
-        exp_results = []
-        for exp in range(0, num_experiments):
-
-            model = LogisticRegressionModel(train_input_x.shape[1], num_classes)
-
-            custom_cleanlab_config = CleanLabConfig(
-                # seed=seed,
-                cv_n_folds=cv_n_folds,
-                output_classes=num_classes,
-                optimizer=Adam,
-                criterion=CrossEntropyLoss,
-                lr=lr,
-                epochs=epochs,
-                batch_size=batch_size,
-                psx_calculation_method=psx_calculation_method,
-                prune_method=prune_method,
-                use_probabilistic_labels=False
-            )
-            trainer = CleanLabTrainer(
-                model=model,
-                mapping_rules_labels_t=mapping_rules_labels_t,
-                model_input_x=train_features_dataset,
-                rule_matches_z=train_rule_matches_z,
-                trainer_config=custom_cleanlab_config
-            )
-
-            trainer.train()
-            clf_report, _ = trainer.test(test_features_dataset, test_labels_dataset)
-            print(f"Accuracy is: {clf_report['accuracy']}")
-            print(clf_report)
-
-            exp_results.append(clf_report['accuracy'])
+    for config_id, (psx_calculation_method, cv_n_folds, prune_method, epochs, batch_size, lr) in \
+            enumerate(configurations):
+
+        exp_results = accuracies[config_id * num_experiments:(config_id + 1) * num_experiments]
+
+        stats = Welford()
+        for accuracy in exp_results:
+            stats.add(accuracy)
 
         results.append({
             # "seed": seed,
             "lr": lr, "cv_n_folds": cv_n_folds, "prune_method": prune_method, "epochs": epochs,
             "batch_size": batch_size, "psx_calculation_method": psx_calculation_method, "accuracy": exp_results,
-            "mean_accuracy": statistics.mean(exp_results),
-            "std_accuracy": statistics.stdev(exp_results)
+            "mean_accuracy": stats.mean,
+            "std_accuracy": stats.std
         })
 
     with open(os.path.join(path_to_data, 'cl_results.json'), 'w') as file:
         json.dump(results, file)
 
 
+def train_cleanlab_optuna(path_to_data: str, n_trials: int = 30) -> None:
+    """
+    Hyperparameter search with a TPE sampler and Successive Halving pruning instead of the exhaustive grid.
+    Every trial runs the experiment repetitions one by one and reports the running mean accuracy, so weak
+    configurations are pruned after a few repetitions instead of being evaluated to completion.
+    """
+    import optuna       # only needed for this search mode, not for the exhaustive grid
+
+    num_experiments = 10
+
+    parameters = dict(
+        psx_calculation_method=['signatures', 'rules', 'random'],
+        cv_n_folds=[3, 5, 8],
+        prune_method=['prune_by_class', 'prune_by_noise_rate', 'both'],
+        epochs=[200],
+        batch_size=[128],
+        lr=[0.1],
+    )
+
+    torch.backends.cudnn.benchmark = True
+
+    df_train, df_dev, df_test, train_rule_matches_z, _, mapping_rules_labels_t = read_train_dev_test(path_to_data)
+
+    train_input_x, test_input_x, _ = get_tfidf_features(df_train["sample"], test_data=df_test["sample"])
+
+    test_labels = df_test["label"].tolist()
+    num_classes = max(test_labels) + 1
+
+    base_model = LogisticRegressionModel(train_input_x.shape[1], num_classes)
+
+    def objective(trial: "optuna.Trial") -> float:
+        config = tuple(trial.suggest_categorical(name, values) for name, values in parameters.items())
+
+        stats = Welford()
+        for exp_id in range(0, num_experiments):
+            stats.add(run_experiment(
+                config, exp_id, base_model, train_input_x, test_input_x, test_labels, train_rule_matches_z,
+                mapping_rules_labels_t, num_classes
+            ))
+            trial.report(stats.mean, exp_id)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+
+        return stats.mean
+
+    # the study is persisted to SQLite, so an interrupted search can be resumed (also from another node)
+    study = optuna.create_study(
+        direction="maximize",
+        sampler=optuna.samplers.TPESampler(),
+        pruner=optuna.pruners.SuccessiveHalvingPruner(),
+        storage=f"sqlite:///{os.path.join(path_to_data, 'cl_optuna.db')}",
+        study_name="cleanlab_tuning",
+        load_if_exists=True,
+    )
+    study.optimize(objective, n_trials=n_trials)
+
+    with open(os.path.join(path_to_data, 'cl_optuna_results.json'), 'w') as file:
+        json.dump({"best_params": study.best_params, "best_accuracy": study.best_value}, file)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]))
     parser.add_argument("--path_to_data", help="")
+    parser.add_argument("--n_jobs", type=int, default=None, help="number of parallel worker processes")
+    parser.add_argument("--tuner", choices=["grid", "optuna"], default="grid",
+                        help="exhaustive grid search or optuna search with successive halving")
+    parser.add_argument("--n_trials", type=int, default=30, help="number of optuna trials")
 
     args = parser.parse_args()
-    train_cleanlab(args.path_to_data)
\ No newline at end of file
+    if args.tuner == "optuna":
+        train_cleanlab_optuna(args.path_to_data, args.n_trials)
+    else:
+        train_cleanlab(args.path_to_data, args.n_jobs)
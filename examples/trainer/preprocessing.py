@@ -1,12 +1,61 @@
+import hashlib
+import os
 from typing import List, Union, Tuple
 from joblib import dump
 
 from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
 
 import numpy as np
+import torch
 from torch.utils.data import TensorDataset
 
 
+class FlatIdfTfidfVectorizer(TfidfVectorizer):
+    """
+    TfidfVectorizer that keeps the idf weights as a flat array and applies them with an elementwise multiplication
+    over the nonzero entries. This avoids the sparse diagonal matrix sklearn rebuilds on every transform and the
+    sparse x sparse product it performs, so a transform costs a single pass over the nonzeros.
+    """
+
+    def fit(self, raw_documents, y=None):
+        counts = super(TfidfVectorizer, self).fit_transform(raw_documents)
+        self._fit_flat_idf(counts)
+        return self
+
+    def fit_transform(self, raw_documents, y=None):
+        counts = super(TfidfVectorizer, self).fit_transform(raw_documents)
+        self._fit_flat_idf(counts)
+        return self._apply_tfidf(counts)
+
+    def transform(self, raw_documents):
+        counts = super(TfidfVectorizer, self).transform(raw_documents)
+        return self._apply_tfidf(counts)
+
+    def _fit_flat_idf(self, counts):
+        """ Computes the idf vector directly from the document frequencies, following sklearn's smooth_idf
+        formula. The private TfidfTransformer is bypassed entirely: the point at which it is constructed has
+        moved between sklearn versions, so reaching into it is not safe across releases. """
+        if not self.use_idf:
+            return
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.float64)
+        document_frequency += int(self.smooth_idf)
+        n_samples = counts.shape[0] + int(self.smooth_idf)
+        self._idf_flat = np.log(n_samples / document_frequency) + 1.0
+
+    def _apply_tfidf(self, counts):
+        if counts.dtype != np.float64:
+            counts = counts.astype(np.float64)
+        if self.sublinear_tf:
+            np.log(counts.data, counts.data)
+            counts.data += 1
+        if self.use_idf:
+            np.multiply(counts.data, np.take(self._idf_flat, counts.indices), out=counts.data)
+        if self.norm:
+            counts = normalize(counts, norm=self.norm, copy=False)
+        return counts
+
+
 def get_tfidf_features(
         train_data: List, test_data: List = None, dev_data: List = None, path_to_cache: str = None,
         max_features: int = None
@@ -24,7 +73,7 @@ def get_tfidf_features(
     """
 
     dev_transformed_data, test_transformed_data = None, None
-    vectorizer = TfidfVectorizer(max_features=max_features)
+    vectorizer = FlatIdfTfidfVectorizer(max_features=max_features)
 
     train_transformed_data = vectorizer.fit_transform(train_data)
     if test_data is not None:
@@ -40,19 +89,36 @@ def get_tfidf_features(
     return train_transformed_data, test_transformed_data, dev_transformed_data
 
 
-def convert_text_to_transformer_input(tokenizer, texts: List[str]) -> TensorDataset:
+def convert_text_to_transformer_input(tokenizer, texts: List[str], cache_dir: str = None) -> TensorDataset:
     """
     Convert input data to BERT encoded features (more details could be found at
     https://huggingface.co/transformers/model_doc)
     :param texts: training/dev/test samples that are to be encoded with BERT features. Can be given as Series or
     as DataFrames with specified column number where the sample are stored.
     :param tokenizer: DistilBertTokenizer tokenizer for english from HuggingFace
+    :param cache_dir: a path to the folder where the tokenized inputs are cached. On a repeated call with the same
+    texts and the same tokenizer, the cached arrays are memory-mapped instead of tokenizing anew.
     :return: TensorDataset with encoded data
     """
+    if cache_dir is not None:
+        key = hashlib.sha1(("\x00".join(texts) + tokenizer.name_or_path).encode("utf-8")).hexdigest()
+        input_ids_file = os.path.join(cache_dir, f"{key}_input_ids.npy")
+        attention_mask_file = os.path.join(cache_dir, f"{key}_attention_mask.npy")
+
+        if os.path.isfile(input_ids_file) and os.path.isfile(attention_mask_file):
+            input_ids = torch.from_numpy(np.load(input_ids_file, mmap_mode="r"))
+            attention_mask = torch.from_numpy(np.load(attention_mask_file, mmap_mode="r"))
+            return TensorDataset(input_ids, attention_mask)
+
     encoding = tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
     input_ids = encoding.get('input_ids')
     attention_mask = encoding.get('attention_mask')
 
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.save(input_ids_file, input_ids.numpy())
+        np.save(attention_mask_file, attention_mask.numpy())
+
     input_values_x = TensorDataset(input_ids, attention_mask)
 
     return input_values_x
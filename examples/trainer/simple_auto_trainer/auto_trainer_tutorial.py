@@ -31,7 +31,8 @@ def np_array_to_tensor_dataset(x: np.ndarray) -> TensorDataset:
     :rtype: object
     """
     if isinstance(x, sp.csr_matrix):
-        x = x.toarray()
+        # cast while still sparse so the dense array is written once, directly in float32
+        x = x.astype(np.float32).toarray()
     x = torch.from_numpy(x)
     x = TensorDataset(x)
     return x
@@ -71,11 +72,15 @@ print(f"Train Z dimension: {train_rule_matches_z.shape}")
 print(f"Train avg. matches per sample: {train_rule_matches_z.sum() / train_rule_matches_z.shape[0]}")
 
 model_name = "distilbert-base-uncased"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
+# the Rust-based fast tokenizer parallelizes across cores on batched input
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
 
-X_train = convert_text_to_transformer_input(tokenizer, df_train["sample"].tolist())
-X_dev = convert_text_to_transformer_input(tokenizer, df_dev["sample"].tolist())
-X_test = convert_text_to_transformer_input(tokenizer, df_test["sample"].tolist())
+# on a repeated launch the cached tokenized arrays are memory-mapped instead of tokenizing the corpora anew
+tokenizer_cache_dir = os.path.join(processed_data_dir, "tokenized")
+X_train = convert_text_to_transformer_input(tokenizer, df_train["sample"].tolist(), cache_dir=tokenizer_cache_dir)
+X_dev = convert_text_to_transformer_input(tokenizer, df_dev["sample"].tolist(), cache_dir=tokenizer_cache_dir)
+X_test = convert_text_to_transformer_input(tokenizer, df_test["sample"].tolist(), cache_dir=tokenizer_cache_dir)
 
 y_dev = np_array_to_tensor_dataset(df_dev['label'].values)
 y_test = np_array_to_tensor_dataset(df_test['label'].values)
@@ -91,7 +96,8 @@ custom_model_config = AutoConfig.create_config(
     lr=1e-4,
     batch_size=16,
     epochs=2,
-    filter_non_labelled=True
+    filter_non_labelled=True,
+    length_bucketing=True  # batch samples of a similar length together and pad each batch to its own max length
 )
 
 print(custom_model_config)
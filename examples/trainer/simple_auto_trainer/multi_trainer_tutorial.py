@@ -1,5 +1,4 @@
 import os
-from torch import Tensor
 from tqdm.auto import tqdm
 
 import joblib
@@ -52,7 +51,8 @@ df_test = pd.read_csv(os.path.join(processed_data_dir, "df_test.csv"))
 
 def np_array_to_tensor_dataset(x: np.ndarray) -> TensorDataset:
     if isinstance(x, sp.csr_matrix):
-        x = x.toarray()
+        # cast while still sparse so the dense array is written once, directly in float32
+        x = x.astype(np.float32).toarray()
     x = torch.from_numpy(x)
     x = TensorDataset(x)
     return x
@@ -72,8 +72,8 @@ X_train_tfidf, X_test_tfidf, _ = get_tfidf_features(
     test_data=df_test["sample"].tolist()
 )
 # convert input features to datasets
-X_train_tfidf_dataset = TensorDataset(Tensor(X_train_tfidf.toarray()))
-X_test_tfidf_dataset = TensorDataset(Tensor(X_test_tfidf.toarray()))
+X_train_tfidf_dataset = np_array_to_tensor_dataset(X_train_tfidf)
+X_test_tfidf_dataset = np_array_to_tensor_dataset(X_test_tfidf)
 
 # get test labels
 y_test = np_array_to_tensor_dataset(df_test['label'].values)
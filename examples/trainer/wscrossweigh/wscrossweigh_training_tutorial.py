@@ -3,13 +3,15 @@ import os
 import sys
 
 import joblib
+import numpy as np
 import pandas as pd
+import torch
 from minio import Minio
-from torch import Tensor, LongTensor
+from torch import LongTensor
 from torch.optim import Adam
 from torch.utils.data import TensorDataset
 from tqdm import tqdm
-from transformers import DistilBertTokenizer, DistilBertForSequenceClassification, AdamW
+from transformers import DistilBertTokenizerFast, DistilBertForSequenceClassification, AdamW
 from examples.trainer.preprocessing import convert_text_to_transformer_input, get_tfidf_features
 from knodle.model.logistic_regression_model import LogisticRegressionModel
 from knodle.trainer.wscrossweigh.config import WSCrossWeighConfig
@@ -59,16 +61,18 @@ def train_wscrossweigh(path_to_data: str, num_classes: int) -> None:
     # sample weights are calculated with logistic regression model (with TF-IDF features); the BERT model is used for
     # the final classifier training.
     train_tfidf_sparse, dev_tfidf_sparse, _ = get_tfidf_features(df_train["sample"].tolist(), df_dev["sample"].tolist())
-    train_tfidf = Tensor(train_tfidf_sparse.toarray())
+    train_tfidf = torch.from_numpy(train_tfidf_sparse.astype(np.float32).toarray())
     train_dataset_tfidf = TensorDataset(train_tfidf)
 
     # For the BERT training we convert train, dev, test data to BERT encoded features (input indices & attention mask)
     model_name = 'distilbert-base-uncased'
-    tokenizer = DistilBertTokenizer.from_pretrained(model_name)
+    # the Rust-based fast tokenizer parallelizes across cores on batched input
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+    tokenizer = DistilBertTokenizerFast.from_pretrained(model_name)
 
-    X_train = convert_text_to_transformer_input(df_train["sample"].tolist(), tokenizer)
-    X_dev = convert_text_to_transformer_input(df_dev["sample"].tolist(), tokenizer)
-    X_test = convert_text_to_transformer_input(df_test["sample"].tolist(), tokenizer)
+    X_train = convert_text_to_transformer_input(tokenizer, df_train["sample"].tolist())
+    X_dev = convert_text_to_transformer_input(tokenizer, df_dev["sample"].tolist())
+    X_test = convert_text_to_transformer_input(tokenizer, df_test["sample"].tolist())
 
     y_dev = TensorDataset(LongTensor(df_dev["label"].tolist()))
     y_test = TensorDataset(LongTensor(df_test["label"].tolist()))
@@ -8,6 +8,9 @@ class LogisticRegressionModel(nn.Module):
         self.linear = torch.nn.Linear(input_dim, output_classes)
 
     def forward(self, x):
+        if x.layout != torch.strided:
+            # sparse input (e.g. TF-IDF features): nn.Linear cannot consume sparse tensors directly
+            return torch.sparse.mm(x, self.linear.weight.t()) + self.linear.bias
         x = x.float()
         outputs = self.linear(x)
         return outputs
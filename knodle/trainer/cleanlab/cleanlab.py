@@ -1,21 +1,40 @@
 import logging
+import os
 
 import numpy as np
+import scipy.sparse as sp
 from cleanlab.classification import LearningWithNoisyLabels
 from skorch import NeuralNetClassifier
-from torch.utils.data import TensorDataset
+import torch
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data.distributed import DistributedSampler
 
 from knodle.trainer import MajorityVoteTrainer
 from knodle.trainer.auto_trainer import AutoTrainer
 from knodle.trainer.cleanlab.config import CleanLabConfig
 from knodle.trainer.cleanlab.latent_estimation import estimate_cv_predicted_probabilities_split_by_rules, \
     estimate_cv_predicted_probabilities_split_by_signatures
+from knodle.trainer.utils.utils import set_seed
 from knodle.transformation.majority import input_to_majority_vote_input
 from knodle.transformation.torch_input import dataset_to_numpy_input
 
 logger = logging.getLogger(__name__)
 
 
+class DistributedNeuralNetClassifier(NeuralNetClassifier):
+    """ NeuralNetClassifier that shards the training batches across the DistributedDataParallel processes """
+
+    def get_iterator(self, dataset, training: bool = False) -> DataLoader:
+        if training and dist.is_initialized():
+            sampler = DistributedSampler(dataset)
+            # without set_epoch every epoch would replay the shuffle order of epoch 0
+            sampler.set_epoch(len(self.history))
+            return DataLoader(dataset, batch_size=self.batch_size, sampler=sampler)
+        return super().get_iterator(dataset, training=training)
+
+
 @AutoTrainer.register('cleanlab')
 class CleanLabTrainer(MajorityVoteTrainer):
     def __init__(self, **kwargs):
@@ -26,7 +45,8 @@ class CleanLabTrainer(MajorityVoteTrainer):
     def train(
             self,
             model_input_x: TensorDataset = None, rule_matches_z: np.ndarray = None,
-            dev_model_input_x: TensorDataset = None, dev_gold_labels_y: TensorDataset = None
+            dev_model_input_x: TensorDataset = None, dev_gold_labels_y: TensorDataset = None,
+            psx: np.ndarray = None
     ) -> None:
 
         self._load_train_params(model_input_x, rule_matches_z, dev_model_input_x, dev_gold_labels_y)
@@ -35,8 +55,50 @@ class CleanLabTrainer(MajorityVoteTrainer):
         if dev_model_input_x is not None and dev_gold_labels_y is not None:
             logger.info("Validation data is not used during Cleanlab training")
 
-        # since CL accepts only sklearn.classifier compliant class, we wraps the PyTorch model
-        self.model = NeuralNetClassifier(
+        self._wrap_model()
+        noisy_y_train = self._prepare_noisy_input()
+
+        # turn input to the CL-compatible format
+        model_input_x_numpy = dataset_to_numpy_input(self.model_input_x)
+
+        if psx is None:
+            psx = self._estimate_psx(noisy_y_train)
+
+        # CL denoising and training
+        rp = LearningWithNoisyLabels(
+            clf=self.model, seed=self.trainer_config.seed,
+            cv_n_folds=self.trainer_config.cv_n_folds,
+            prune_method=self.trainer_config.prune_method,
+            converge_latent_estimates=self.trainer_config.converge_latent_estimates,
+            pulearning=self.trainer_config.pulearning,
+            n_jobs=self.trainer_config.n_jobs
+        )
+        _ = rp.fit(model_input_x_numpy, noisy_y_train, psx=psx)
+        if not dist.is_initialized() or dist.get_rank() == 0:
+            logging.info("Training is done.")
+
+    def calculate_psx(self) -> np.ndarray:
+        """
+        Runs the same preprocessing as train() and returns the out-of-sample predicted probabilities. Since psx only
+        depends on the psx_calculation_method and cv_n_folds settings (besides the input data and the fold model), it
+        can be computed once on a dedicated trainer instance and passed to train(psx=...) of every trainer that shares
+        these settings, instead of being recomputed for each of them.
+        Returns None for the "random" method, where cleanlab computes psx internally.
+        """
+        self._apply_rule_reduction()
+        self._wrap_model()
+        noisy_y_train = self._prepare_noisy_input()
+        return self._estimate_psx(noisy_y_train)
+
+    def _wrap_model(self) -> None:
+        """ Wraps the PyTorch model into a skorch classifier, since CL accepts only sklearn compliant classes """
+        if self.trainer_config.use_ddp:
+            self._init_distributed()
+            classifier_class = DistributedNeuralNetClassifier
+        else:
+            classifier_class = NeuralNetClassifier
+
+        self.model = classifier_class(
             self.model,
             criterion=self.trainer_config.criterion,
             optimizer=self.trainer_config.optimizer,
@@ -48,45 +110,65 @@ class CleanLabTrainer(MajorityVoteTrainer):
             device=self.trainer_config.device
         )
 
-        # calculate labels based on t and z; perform additional filtering if applicable
+    def _prepare_noisy_input(self) -> np.ndarray:
+        """ Calculates the noisy labels based on t and z matrices and performs additional filtering if applicable """
+        # keep the rule matches sparse: the majority vote matmul, the filtering and the fold splitting then work
+        # on O(nnz) entries instead of scanning a dense instances x rules matrix
+        if not sp.issparse(self.rule_matches_z):
+            self.rule_matches_z = sp.csr_matrix(self.rule_matches_z)
+
         self.model_input_x, noisy_y_train, self.rule_matches_z = input_to_majority_vote_input(
             self.rule_matches_z, self.mapping_rules_labels_t, self.model_input_x,
             use_probabilistic_labels=self.trainer_config.use_probabilistic_labels,
             filter_non_labelled=self.trainer_config.filter_non_labelled,
             other_class_id=self.trainer_config.other_class_id,)
 
-        # turn input to the CL-compatible format
-        model_input_x_numpy = dataset_to_numpy_input(self.model_input_x)
+        return noisy_y_train
 
-        # calculate psx in advance with splitting by rules
+    def _estimate_psx(self, noisy_y_train: np.ndarray) -> np.ndarray:
+        """ Calculates psx in advance with the configured fold splitting method """
         if self.trainer_config.psx_calculation_method == "rules":
-            psx = estimate_cv_predicted_probabilities_split_by_rules(
+            return estimate_cv_predicted_probabilities_split_by_rules(
                 self.model_input_x, noisy_y_train, self.rule_matches_z, self.model, self.trainer_config.output_classes,
                 seed=self.trainer_config.seed, cv_n_folds=self.trainer_config.cv_n_folds
             )
 
-        elif self.trainer_config.psx_calculation_method == "signatures":
-            psx = estimate_cv_predicted_probabilities_split_by_signatures(
+        if self.trainer_config.psx_calculation_method == "signatures":
+            return estimate_cv_predicted_probabilities_split_by_signatures(
                 self.model_input_x, noisy_y_train, self.rule_matches_z, self.model, self.trainer_config.output_classes,
                 seed=self.trainer_config.seed, cv_n_folds=self.trainer_config.cv_n_folds
             )
 
-        elif self.trainer_config.psx_calculation_method == "random":
+        if self.trainer_config.psx_calculation_method == "random":
             # if no psx calculation method is specified, psx will be calculated in CL with random folder splitting
-            psx = None
-
+            return None
+
+        raise ValueError("Unknown psx calculation method.")
+
+    def _init_distributed(self) -> None:
+        """ Initializes the process group and wraps the model into DistributedDataParallel. The training script is
+        expected to be launched with torchrun, which sets the LOCAL_RANK environment variable for each process. """
+        if not dist.is_initialized():
+            dist.init_process_group(backend="nccl" if torch.cuda.is_available() else "gloo")
+
+        local_rank = int(os.environ.get("LOCAL_RANK", 0))
+        if torch.cuda.is_available():
+            torch.cuda.set_device(local_rank)
+            self.trainer_config.device = torch.device("cuda", local_rank)
+
+        # every rank must derive the same noisy labels, fold splits and pruned sample set: otherwise the per-rank
+        # datasets differ in size, the batch counts desynchronize and the gradient all-reduce hangs. The seed of
+        # rank 0 is therefore shared with all processes before any random decision is made.
+        seed = self.trainer_config.seed if self.trainer_config.seed is not None else torch.initial_seed() % (2 ** 31)
+        seed_tensor = torch.tensor(seed, device=self.trainer_config.device if torch.cuda.is_available() else None)
+        dist.broadcast(seed_tensor, src=0)
+        self.trainer_config.seed = int(seed_tensor.item())
+        set_seed(self.trainer_config.seed)
+
+        if torch.cuda.is_available():
+            self.model = DistributedDataParallel(
+                self.model.to(self.trainer_config.device), device_ids=[local_rank]
+            )
         else:
-            raise ValueError("Unknown psx calculation method.")
-
-        # CL denoising and training
-        rp = LearningWithNoisyLabels(
-            clf=self.model, seed=self.trainer_config.seed,
-            cv_n_folds=self.trainer_config.cv_n_folds,
-            prune_method=self.trainer_config.prune_method,
-            converge_latent_estimates=self.trainer_config.converge_latent_estimates,
-            pulearning=self.trainer_config.pulearning,
-            n_jobs=self.trainer_config.n_jobs
-        )
-        _ = rp.fit(model_input_x_numpy, noisy_y_train, psx=psx)
-        logging.info("Training is done.")
+            self.model = DistributedDataParallel(self.model.to(self.trainer_config.device))
 
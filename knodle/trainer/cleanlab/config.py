@@ -13,6 +13,7 @@ class CleanLabConfig(MajorityConfig):
             pulearning=None,
             n_jobs: int = None,
             psx_calculation_method: str = 'random',
+            use_ddp: bool = False,
             **kwargs
     ):
         """
@@ -43,9 +44,14 @@ class CleanLabConfig(MajorityConfig):
             (certain no errors in that class).
 
         :param n_jobs: int (Windows users may see a speed-up with n_jobs = 1).
-            Number of processing threads used by
-            multiprocessing. Default None sets to the number of processing threads on your CPU. Set this to 1 to REMOVE
-            parallel processing (if its causing issues).
+            Number of processing threads used by multiprocessing in cleanlab's pruning step. Default None
+            sets n_jobs to the number of CPU threads. Set this to 1 to REMOVE parallel processing (if its
+            causing issues).
+
+        :param use_ddp: bool (Default: False)
+            If set to True, the classifier will be wrapped into torch DistributedDataParallel and the training batches
+            will be sharded across the processes. The training script is to be launched with torchrun
+            (one process per GPU).
         """
 
         super().__init__(**kwargs)
@@ -55,3 +61,4 @@ class CleanLabConfig(MajorityConfig):
         self.pulearning = pulearning
         self.n_jobs = n_jobs
         self.psx_calculation_method = psx_calculation_method
+        self.use_ddp = use_ddp
@@ -1,8 +1,8 @@
 import copy
 
 import numpy as np
+from joblib import Parallel, delayed
 from sklearn.base import RegressorMixin
-from tqdm import tqdm
 
 from knodle.trainer.wscrossweigh.data_splitting_by_rules import (
     k_folds_splitting_by_rules, k_folds_splitting_by_signatures
@@ -46,21 +46,32 @@ def estimate_cv_predicted_probabilities_split_by_signatures(
     return compute_psx_matrix(model, cv_train_datasets, cv_holdout_datasets, labels, num_classes)
 
 
-def compute_psx_matrix(model, cv_train_datasets, cv_holdout_datasets, labels, num_classes):
+def _fit_fold(model, cv_train_dataset, cv_holdout_dataset):
+    model_copy = copy.deepcopy(model)
+    X_train_cv, y_train_cv = cv_train_dataset.tensors[0].cpu().detach().numpy(), \
+                             cv_train_dataset.tensors[1].cpu().detach().numpy()
+    X_holdout_cv, indices_holdout_cv, y_holdout_cv = cv_holdout_dataset.tensors[0].cpu().detach().numpy(), \
+                                                     cv_holdout_dataset.tensors[1].cpu().detach().numpy(), \
+                                                     cv_holdout_dataset.tensors[2].cpu().detach().numpy()
 
-    psx = np.zeros((len(labels), num_classes))
+    # y_train_cv = np.argmax(y_train_cv, axis=1)
+    model_copy.fit(X_train_cv, y_train_cv)
+    psx_cv = model_copy.predict_proba(X_holdout_cv)  # P(s = k|x) # [:,1]
+    return indices_holdout_cv, psx_cv
+
+
+def compute_psx_matrix(model, cv_train_datasets, cv_holdout_datasets, labels, num_classes, n_jobs: int = None):
+    folds = list(zip(cv_train_datasets, cv_holdout_datasets))
 
-    for k, (cv_train_dataset, cv_holdout_dataset) in tqdm(enumerate(zip(cv_train_datasets, cv_holdout_datasets))):
-        model_copy = copy.deepcopy(model)
-        X_train_cv, y_train_cv = cv_train_dataset.tensors[0].cpu().detach().numpy(), \
-                                 cv_train_dataset.tensors[1].cpu().detach().numpy()
-        X_holdout_cv, indices_holdout_cv, y_holdout_cv = cv_holdout_dataset.tensors[0].cpu().detach().numpy(), \
-                                                         cv_holdout_dataset.tensors[1].cpu().detach().numpy(), \
-                                                         cv_holdout_dataset.tensors[2].cpu().detach().numpy()
-
-        # y_train_cv = np.argmax(y_train_cv, axis=1)
-        model_copy.fit(X_train_cv, y_train_cv)
-        psx_cv = model_copy.predict_proba(X_holdout_cv)  # P(s = k|x) # [:,1]
+    # the folds are independent of each other: every worker fits its own model copy on one train split and
+    # predicts the corresponding holdout split, so the fold fits run in parallel processes
+    fold_results = Parallel(n_jobs=n_jobs if n_jobs is not None else len(folds))(
+        delayed(_fit_fold)(model, cv_train_dataset, cv_holdout_dataset)
+        for cv_train_dataset, cv_holdout_dataset in folds
+    )
+
+    psx = np.zeros((len(labels), num_classes))
+    for indices_holdout_cv, psx_cv in fold_results:
         psx[indices_holdout_cv] = psx_cv
 
     return psx
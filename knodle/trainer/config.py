@@ -30,7 +30,9 @@ class TrainerConfig:
             device: str = None,
             caching_folder: str = os.path.join(pathlib.Path().absolute(), "cache"),
             caching_suffix: str = "",
-            saved_models_dir: str = None
+            saved_models_dir: str = None,
+            amp_dtype: str = None,
+            length_bucketing: bool = False
     ):
         """
         A default and minimum sufficient configuration of a Trainer instance.
@@ -52,6 +54,11 @@ class TrainerConfig:
         sample weights calculated in different iterations and stored in different files.)
         :param saved_models_dir: a path to the folder where trained models will be stored. If None, the trained models
         won't be stored.
+        :param amp_dtype: the dtype used for automatic mixed precision training and prediction ("bfloat16" or
+        "float16"). If None (default), everything is computed in full precision. Only used when training on CUDA.
+        :param length_bucketing: if set to True, transformer inputs (input ids + attention mask) are batched with
+        samples of a similar length together, and each batch is padded only to its own maximum length instead of
+        the dataset-wide one. Inputs encoded with a single feature tensor are not affected.
         """
         self.seed = seed
         if self.seed is not None:
@@ -78,6 +85,13 @@ class TrainerConfig:
         self.device = torch.device(device) if device is not None else check_and_return_device()
         logger.info(f"Model will be trained on {self.device}")
 
+        self.amp_dtype = getattr(torch, amp_dtype) if isinstance(amp_dtype, str) else amp_dtype
+        if self.amp_dtype is not None and self.device.type != "cuda":
+            logger.info("Automatic mixed precision is only supported on CUDA devices; amp_dtype will be ignored.")
+            self.amp_dtype = None
+
+        self.length_bucketing = length_bucketing
+
         if epochs <= 0:
             raise ValueError("Epochs needs to be positive")
         self.epochs = epochs
@@ -49,13 +49,10 @@ class KNNAggregationTrainer(MajorityVoteTrainer):
         # initialise optimizer
         self.trainer_config.optimizer = self.initialise_optimizer()
 
-        self.rule_matches_z = self.rule_matches_z.astype(np.int8)
-        self.mapping_rules_labels_t = self.mapping_rules_labels_t.astype(np.int8)
-
         self._knn_denoise_rule_matches()
 
         self.model_input_x, noisy_input_y, self.rule_matches_z = input_to_majority_vote_input(
-            self.rule_matches_z, self.mapping_rules_labels_t.astype(np.int64), self.model_input_x,
+            self.rule_matches_z, self.mapping_rules_labels_t, self.model_input_x,
             use_probabilistic_labels=self.trainer_config.use_probabilistic_labels,
             filter_non_labelled=self.trainer_config.filter_non_labelled,
             probability_threshold=self.trainer_config.probability_threshold,
@@ -1,6 +1,7 @@
+import contextlib
 import os
 import logging
-from typing import Union, Dict, Tuple
+from typing import Callable, Union, Dict, Tuple
 
 import skorch
 from tqdm.auto import tqdm
@@ -12,11 +13,13 @@ from sklearn.metrics import classification_report
 import torch
 from torch import Tensor
 from torch.nn import Module
-from torch.utils.data import TensorDataset, DataLoader
+from torch.utils.data import TensorDataset, DataLoader, Sampler
 import torch.nn.functional as F
 
 from knodle.evaluation.other_class_metrics import classification_report_other_class
-from knodle.transformation.torch_input import input_labels_to_tensordataset, dataset_to_numpy_input
+from knodle.transformation.torch_input import (
+    LengthBucketSampler, collate_pad_to_batch_max_length, input_labels_to_tensordataset, dataset_to_numpy_input
+)
 from knodle.transformation.rule_reduction import reduce_rule_matches
 from knodle.evaluation.plotting import draw_loss_accuracy_plot
 
@@ -48,9 +51,10 @@ class Trainer(ABC):
                 trainer_config: Config for different parameters like loss function, optimizer, batch size.
         """
         self.model = model
-        self.mapping_rules_labels_t = mapping_rules_labels_t
+        # both matrices only hold {0, 1}; int8 keeps them 4-8x smaller than the default float64/int64 dtypes
+        self.mapping_rules_labels_t = mapping_rules_labels_t.astype(np.int8, copy=False)
         self.model_input_x = model_input_x
-        self.rule_matches_z = rule_matches_z
+        self.rule_matches_z = rule_matches_z.astype(np.int8, copy=False)
         self.dev_model_input_x = dev_model_input_x
         self.dev_gold_labels_y = dev_gold_labels_y
 
@@ -115,20 +119,47 @@ class BaseTrainer(Trainer):
         self.mapping_rules_labels_t = reduced_dict["mapping_rules_labels_t"]
 
     def _make_dataloader(
-            self, dataset: TensorDataset, shuffle: bool = True
+            self, dataset: TensorDataset, shuffle: bool = True,
+            batch_sampler: Sampler = None, collate_fn: Callable = None
     ) -> DataLoader:
+        if batch_sampler is None and self.trainer_config.length_bucketing:
+            tensors = dataset.tensors
+            if len(tensors) >= 2 and tensors[0].dim() == 2 and tensors[1].shape == tensors[0].shape:
+                # transformer input (input ids, attention mask, ...): batch samples of a similar length together
+                # and pad every batch only to its own maximum length
+                batch_sampler = LengthBucketSampler(tensors[1].sum(dim=1), self.trainer_config.batch_size, shuffle)
+                collate_fn = collate_pad_to_batch_max_length
+
+        # on CUDA, pinned host memory and background workers overlap batch preparation with compute
+        on_cuda = self.trainer_config.device.type == "cuda"
+        loader_kwargs = dict(
+            pin_memory=on_cuda,
+            num_workers=os.cpu_count() // 2 if on_cuda else 0,
+            collate_fn=collate_fn,
+        )
+        if batch_sampler is not None:
+            # e.g. a LengthBucketSampler: the sampler determines the batch composition itself
+            return DataLoader(dataset, batch_sampler=batch_sampler, **loader_kwargs)
         dataloader = DataLoader(
             dataset,
             batch_size=self.trainer_config.batch_size,
             drop_last=False,
             shuffle=shuffle,
+            **loader_kwargs,
         )
         return dataloader
 
+    def _autocast_context(self):
+        """ Returns the autocast context for mixed precision runs or a no-op context if AMP is disabled """
+        if self.trainer_config.amp_dtype is not None:
+            return torch.autocast(device_type=self.trainer_config.device.type, dtype=self.trainer_config.amp_dtype)
+        return contextlib.nullcontext()
+
     def _load_batch(self, batch):
 
-        input_batch = [inp.to(self.trainer_config.device) for inp in batch[0: -1]]
-        label_batch = batch[-1].to(self.trainer_config.device)
+        # non_blocking lets the host-to-device copies of pinned batches overlap with compute
+        input_batch = [inp.to(self.trainer_config.device, non_blocking=True) for inp in batch[0: -1]]
+        label_batch = batch[-1].to(self.trainer_config.device, non_blocking=True)
 
         return input_batch, label_batch
 
@@ -141,6 +172,9 @@ class BaseTrainer(Trainer):
         self.model.to(self.trainer_config.device)
         self.model.train()
 
+        # the scaler is only active for float16 mixed precision; bfloat16 does not need loss scaling
+        scaler = torch.cuda.amp.GradScaler(enabled=self.trainer_config.amp_dtype == torch.float16)
+
         train_losses, train_acc = [], []
         if self.dev_model_input_x is not None:
             dev_losses, dev_acc = [], []
@@ -157,25 +191,30 @@ class BaseTrainer(Trainer):
 
                 # forward pass
                 self.trainer_config.optimizer.zero_grad()
-                outputs = self.model(*input_batch)
-                if isinstance(outputs, torch.Tensor):
-                    logits = outputs
-                else:
-                    logits = outputs[0]
-
-                if use_sample_weights:
-                    loss_no_reduction = self.trainer_config.criterion(
-                        logits, label_batch, weight=self.trainer_config.class_weights, reduction="none"
-                    )
-                    loss = (loss_no_reduction * sample_weights).mean()
-                else:
-                    loss = self.trainer_config.criterion(logits, label_batch, weight=self.trainer_config.class_weights)
+                with self._autocast_context():
+                    outputs = self.model(*input_batch)
+                    if isinstance(outputs, torch.Tensor):
+                        logits = outputs
+                    else:
+                        logits = outputs[0]
+
+                    if use_sample_weights:
+                        loss_no_reduction = self.trainer_config.criterion(
+                            logits, label_batch, weight=self.trainer_config.class_weights, reduction="none"
+                        )
+                        loss = (loss_no_reduction * sample_weights).mean()
+                    else:
+                        loss = self.trainer_config.criterion(
+                            logits, label_batch, weight=self.trainer_config.class_weights
+                        )
 
                 # backward pass
-                loss.backward()
+                scaler.scale(loss).backward()
                 if isinstance(self.trainer_config.grad_clipping, (int, float)):
+                    scaler.unscale_(self.trainer_config.optimizer)
                     torch.nn.utils.clip_grad_norm_(self.model.parameters(), self.trainer_config.grad_clipping)
-                self.trainer_config.optimizer.step()
+                scaler.step(self.trainer_config.optimizer)
+                scaler.update()
                 acc = accuracy_of_probs(logits, label_batch)
 
                 epoch_loss += loss.detach().item()
@@ -234,15 +273,14 @@ class BaseTrainer(Trainer):
         predictions_list, label_list = [], []
         dev_loss, dev_acc = 0.0, 0.0
 
-        i = 0
-        # Loop over predictions
-        with torch.no_grad():
+        # Loop over predictions; inference_mode also skips the autograd bookkeeping no_grad still performs
+        with torch.inference_mode():
             for batch in tqdm(feature_label_dataloader):
                 input_batch, label_batch = self._load_batch(batch)
 
                 # forward pass
-                self.trainer_config.optimizer.zero_grad()
-                outputs = self.model(*input_batch)
+                with self._autocast_context():
+                    outputs = self.model(*input_batch)
                 if isinstance(outputs, torch.Tensor):
                     prediction_vals = outputs
                 else:
@@ -251,13 +289,12 @@ class BaseTrainer(Trainer):
                 if loss_calculation:
                     dev_loss += self._calculate_dev_loss(prediction_vals, label_batch.long())
 
-                # add predictions and labels
-                predictions = np.argmax(prediction_vals.detach().cpu().numpy(), axis=-1)
-                predictions_list.append(predictions)
-                label_list.append(label_batch.detach().cpu().numpy())
+                # keep per-batch results on the device; they are concatenated and moved to the host once after the loop
+                predictions_list.append(prediction_vals.argmax(dim=-1))
+                label_list.append(label_batch)
 
-        predictions = np.squeeze(np.hstack(predictions_list))
-        gold_labels = np.squeeze(np.hstack(label_list))
+        predictions = np.squeeze(torch.cat(predictions_list).detach().cpu().numpy())
+        gold_labels = np.squeeze(torch.cat(label_list).detach().cpu().numpy())
 
         return predictions, gold_labels, dev_loss
 
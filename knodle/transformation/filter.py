@@ -1,6 +1,7 @@
 from typing import Tuple, Union, List
 
 import numpy as np
+import scipy.sparse as sp
 from torch.utils.data import TensorDataset
 
 
@@ -22,13 +23,15 @@ def filter_tensor_dataset_by_indices(dataset: TensorDataset, filter_ids: Union[n
 
 
 def filter_empty_probabilities(
-        input_data_x: TensorDataset, class_probas_y: np.ndarray, rule_matches_z: np.ndarray = None
+        input_data_x: TensorDataset, class_probas_y: np.ndarray,
+        rule_matches_z: Union[np.ndarray, sp.csr_matrix] = None
 ) -> Union[Tuple[TensorDataset, np.ndarray, np.ndarray], Tuple[TensorDataset, np.ndarray]]:
     """Delete rows of TensorDataset's where the cumulative probability equals 0.
     Args:
         input_data_x: A TensorDataset serving as input to a model
         class_probas_y: Array, holding class probabilities, shape=num_samples, num_classes
-        rule_matches_z: optional array with rules matched in samples. If given, will also be filtered
+        rule_matches_z: optional dense or sparse matrix with rules matched in samples. If given, will also be
+            filtered; a sparse matrix stays sparse
     :return: Modified TensorDataset's
     """
     if len(class_probas_y.shape) != 2:
@@ -36,6 +36,62 @@ def probabilies_to_majority_vote(
         raise ValueError("Specify a way how to resolve unclear majority votes.")
 
 
+def probabilities_to_majority_vote_labels(
+        probs: np.ndarray, choose_random_label: bool = True, other_class_id: int = None
+) -> np.ndarray:
+    """Vectorized equivalent of applying probabilies_to_majority_vote to every row of a probability matrix.
+
+    Rows with a clear majority are resolved with one argmax over the whole matrix; only rows with tied maxima
+    (including all-zero rows) are handled individually. This avoids a Python-level call per sample.
+
+    Args:
+        probs: Matrix of probabilities. Shape: instances x classes
+        choose_random_label: Choose a random label among the tied maxima, if there's no clear majority.
+        other_class_id: Class ID being used, if there's no clear majority
+    Returns: An array of classes. Shape: (instances, )
+    """
+    if choose_random_label and other_class_id is not None:
+        raise ValueError("You can either choose a random class, or transform undefined cases to an other class.")
+
+    majority_labels = probs.argmax(axis=1)
+    row_max = probs.max(axis=1)
+    tie_rows = np.where((probs == row_max[:, None]).sum(axis=1) > 1)[0]
+
+    if tie_rows.size == 0:
+        return majority_labels
+
+    if choose_random_label:
+        for row_id in tie_rows:
+            max_ids = np.where(probs[row_id] == row_max[row_id])[0]
+            majority_labels[row_id] = np.random.choice(max_ids)
+    elif other_class_id is not None:
+        majority_labels[tie_rows] = other_class_id
+    else:
+        raise ValueError("Specify a way how to resolve unclear majority votes.")
+
+    return majority_labels
+
+
+def _z_t_matrices_to_rule_counts(rule_matches_z: np.ndarray, mapping_rules_labels_t: np.ndarray) -> np.ndarray:
+    """ Calculates how often each label was voted for in each sample. Shape: instances x classes """
+    if rule_matches_z.shape[1] != mapping_rules_labels_t.shape[0]:
+        raise ValueError(f"Dimensions mismatch! Z matrix has shape {rule_matches_z.shape}, while "
+                         f"T matrix has shape {mapping_rules_labels_t.shape}")
+
+    if mapping_rules_labels_t.dtype == np.int8:
+        # accumulate the votes in int32: an int8 product would overflow once >127 rules vote for the same label
+        mapping_rules_labels_t = mapping_rules_labels_t.astype(np.int32)
+
+    if isinstance(rule_matches_z, sp.csr_matrix):
+        rule_counts = rule_matches_z.dot(mapping_rules_labels_t)
+        if isinstance(rule_counts, sp.csr_matrix):
+            rule_counts = rule_counts.toarray()
+    else:
+        rule_counts = np.matmul(rule_matches_z, mapping_rules_labels_t)
+
+    return rule_counts
+
+
 def z_t_matrices_to_majority_vote_probs(
         rule_matches_z: np.ndarray, mapping_rules_labels_t: np.ndarray, other_class_id: int = None
 ) -> np.ndarray:
@@ -52,16 +108,7 @@ def z_t_matrices_to_majority_vote_probs(
     Returns: Array with majority vote probabilities. Shape: instances x classes
     """
 
-    if rule_matches_z.shape[1] != mapping_rules_labels_t.shape[0]:
-        raise ValueError(f"Dimensions mismatch! Z matrix has shape {rule_matches_z.shape}, while "
-                         f"T matrix has shape {mapping_rules_labels_t.shape}")
-
-    if isinstance(rule_matches_z, sp.csr_matrix):
-        rule_counts = rule_matches_z.dot(mapping_rules_labels_t)
-        if isinstance(rule_counts, sp.csr_matrix):
-            rule_counts = rule_counts.toarray()
-    else:
-        rule_counts = np.matmul(rule_matches_z, mapping_rules_labels_t)
+    rule_counts = _z_t_matrices_to_rule_counts(rule_matches_z, mapping_rules_labels_t)
 
     if other_class_id:
         if other_class_id < 0:
@@ -92,10 +139,12 @@ def z_t_matrices_to_majority_vote_labels(
         other_class_id: the id of other class, i.e. the class of negative samples
     Returns: Decision per sample. Shape: (instances, )
     """
-    rule_counts_probs = z_t_matrices_to_majority_vote_probs(rule_matches_z, mapping_rules_labels_t)
+    # the normalization to probabilities is skipped since it changes neither the argmax nor the ties
+    rule_counts = _z_t_matrices_to_rule_counts(rule_matches_z, mapping_rules_labels_t)
 
-    kwargs = {"choose_random_label": choose_random_label, "other_class_id": other_class_id}
-    majority_labels = np.apply_along_axis(probabilies_to_majority_vote, axis=1, arr=rule_counts_probs, **kwargs)
+    majority_labels = probabilities_to_majority_vote_labels(
+        rule_counts, choose_random_label=choose_random_label, other_class_id=other_class_id
+    )
     return majority_labels
 
 
@@ -142,7 +191,8 @@ def input_to_majority_vote_input(
 
     if not use_probabilistic_labels:
         # convert labels represented as a prob distribution to a single label using majority voting
-        kwargs = {"choose_random_label": True, "other_class_id": other_class_id}
-        noisy_y_train = np.apply_along_axis(probabilies_to_majority_vote, axis=1, arr=noisy_y_train, **kwargs)
+        noisy_y_train = probabilities_to_majority_vote_labels(
+            noisy_y_train, choose_random_label=True, other_class_id=other_class_id
+        )
 
     return model_input_x, noisy_y_train, rule_matches_z
@@ -1,6 +1,9 @@
+from typing import Iterator, List, Sequence, Tuple
+
 import numpy as np
 import torch
-from torch.utils.data import TensorDataset
+from torch import Tensor
+from torch.utils.data import Sampler, TensorDataset
 
 
 def input_labels_to_tensordataset(model_input_x: TensorDataset, labels: np.ndarray) -> TensorDataset:
@@ -28,6 +31,46 @@ def input_info_labels_to_tensordataset(
     return input_ids_label_dataset
 
 
+class LengthBucketSampler(Sampler):
+    """
+    Yields batches of sample indices grouped by sequence length ("length bucketing"). Since samples of a similar
+    length end up in the same batch, each batch can be padded to its own maximum length instead of the dataset-wide
+    one, which removes most of the compute spent on padding tokens. The bucket order is shuffled on every epoch,
+    so the model still sees the batches in a random order.
+    """
+
+    def __init__(self, lengths: Sequence[int], batch_size: int, shuffle: bool = True):
+        super().__init__(None)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        sorted_indices = torch.argsort(torch.as_tensor(lengths), descending=True)
+        self.buckets = [
+            sorted_indices[i:i + batch_size].tolist() for i in range(0, len(sorted_indices), batch_size)
+        ]
+
+    def __iter__(self) -> Iterator[List[int]]:
+        if self.shuffle:
+            return iter([self.buckets[i] for i in torch.randperm(len(self.buckets))])
+        return iter(self.buckets)
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+
+def collate_pad_to_batch_max_length(batch: List[Tuple[Tensor, ...]]) -> List[Tensor]:
+    """
+    Collate function for datasets of (input ids, attention mask, ...) samples that were padded to a global maximum
+    length: the stacked batch is cut down along the sequence dimension to the longest real sequence in this batch
+    (determined from the attention mask). Together with LengthBucketSampler, batches of short samples become
+    proportionally cheaper to process.
+    """
+    stacked = [torch.stack(sample_tensors) for sample_tensors in zip(*batch)]
+    padded_length = stacked[0].shape[1]
+    batch_max_length = int(stacked[1].sum(dim=1).max().item())
+    # only the tensors padded along the sequence dimension are trimmed; labels etc. are passed through unchanged
+    return [t[:, :batch_max_length] if t.dim() > 1 and t.shape[1] == padded_length else t for t in stacked]
+
+
 def dataset_to_numpy_input(model_input_x: TensorDataset) -> np.ndarray:
     if len(model_input_x.tensors) == 1:
         return model_input_x.tensors[0].detach().cpu().numpy()
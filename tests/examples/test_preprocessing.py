@@ -0,0 +1,62 @@
+import torch
+from numpy.testing import assert_array_almost_equal, assert_array_equal
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from examples.trainer.preprocessing import FlatIdfTfidfVectorizer, convert_text_to_transformer_input
+
+TRAIN_DATA = [
+    "this is the first document",
+    "this document is the second document",
+    "and this is the third one",
+    "is this the first document",
+]
+TEST_DATA = ["the first and the second document", "something entirely different"]
+
+
+def test_flat_idf_fit_transform_equals_stock_vectorizer():
+    stock_tfidf = TfidfVectorizer().fit_transform(TRAIN_DATA)
+    flat_tfidf = FlatIdfTfidfVectorizer().fit_transform(TRAIN_DATA)
+
+    assert_array_almost_equal(flat_tfidf.toarray(), stock_tfidf.toarray())
+
+
+def test_flat_idf_fit_then_transform_equals_stock_vectorizer():
+    stock_tfidf = TfidfVectorizer().fit(TRAIN_DATA).transform(TEST_DATA)
+    flat_tfidf = FlatIdfTfidfVectorizer().fit(TRAIN_DATA).transform(TEST_DATA)
+
+    assert_array_almost_equal(flat_tfidf.toarray(), stock_tfidf.toarray())
+
+
+def test_flat_idf_equals_stock_vectorizer_with_custom_params():
+    stock_tfidf = TfidfVectorizer(sublinear_tf=True, max_features=5).fit_transform(TRAIN_DATA)
+    flat_tfidf = FlatIdfTfidfVectorizer(sublinear_tf=True, max_features=5).fit_transform(TRAIN_DATA)
+
+    assert_array_almost_equal(flat_tfidf.toarray(), stock_tfidf.toarray())
+
+
+class CountingTokenizer:
+    """ Minimal tokenizer stand-in that counts how often the texts are actually tokenized """
+
+    name_or_path = "counting-tokenizer"
+
+    def __init__(self):
+        self.num_calls = 0
+
+    def __call__(self, texts, **kwargs):
+        self.num_calls += 1
+        input_ids = torch.arange(len(texts) * 4).reshape(len(texts), 4)
+        attention_mask = torch.ones((len(texts), 4), dtype=torch.long)
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+def test_convert_text_to_transformer_input_cache_round_trip(tmpdir):
+    tokenizer = CountingTokenizer()
+    cache_dir = str(tmpdir.join("tokenized"))
+
+    first = convert_text_to_transformer_input(tokenizer, TRAIN_DATA, cache_dir=cache_dir)
+    second = convert_text_to_transformer_input(tokenizer, TRAIN_DATA, cache_dir=cache_dir)
+
+    # the second call is served from the cache without tokenizing anew and returns the same encoding
+    assert tokenizer.num_calls == 1
+    assert_array_equal(second.tensors[0].numpy(), first.tensors[0].numpy())
+    assert_array_equal(second.tensors[1].numpy(), first.tensors[1].numpy())
@@ -3,7 +3,8 @@ import pytest
 import numpy as np
 
 from knodle.transformation.majority import (
-    probabilies_to_majority_vote, z_t_matrices_to_majority_vote_probs, z_t_matrices_to_majority_vote_labels
+    probabilies_to_majority_vote, probabilities_to_majority_vote_labels, z_t_matrices_to_majority_vote_probs,
+    z_t_matrices_to_majority_vote_labels
 )
 
 
@@ -53,6 +54,31 @@ def test_probabilies_to_majority_vote_errors():
         result = probabilies_to_majority_vote(probs, **settings)
 
 
+def test_probabilities_to_majority_vote_labels():
+    probs = np.array([
+        [0.5, 0.2, 0.3],
+        [0.1, 0.8, 0.1],
+        [0.5, 0.5, 0.0],
+        [0.0, 0.0, 0.0]
+    ])
+
+    gold_labels = np.array([0, 1, -1, -1])
+
+    labels = probabilities_to_majority_vote_labels(probs, choose_random_label=False, other_class_id=-1)
+    assert np.array_equal(labels, gold_labels)
+
+    random_labels = probabilities_to_majority_vote_labels(probs, choose_random_label=True, other_class_id=None)
+    assert random_labels[0] == 0 and random_labels[1] == 1
+    assert random_labels[2] in [0, 1]
+    assert random_labels[3] in [0, 1, 2]
+
+    with pytest.raises(ValueError):
+        probabilities_to_majority_vote_labels(probs, choose_random_label=False, other_class_id=None)
+
+    with pytest.raises(ValueError):
+        probabilities_to_majority_vote_labels(probs, choose_random_label=True, other_class_id=-1)
+
+
 @pytest.fixture
 def prob_values():
     z = np.zeros((4, 4))
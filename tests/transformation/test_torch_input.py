@@ -0,0 +1,51 @@
+import numpy as np
+from numpy.testing import assert_array_equal
+
+import torch
+from torch import Tensor, equal
+from torch.utils.data import DataLoader, TensorDataset
+
+from knodle.transformation.torch_input import (
+    LengthBucketSampler, collate_pad_to_batch_max_length, input_labels_to_tensordataset
+)
+
+
+def test_input_labels_to_tensordataset():
+
+    a = np.ones((4, 4))
+    b = np.ones((4, 3))
+    labels = np.ones((4,))
+
+    input_data = TensorDataset(Tensor(a), Tensor(b))
+
+    input_label_dataset = input_labels_to_tensordataset(input_data, labels)
+
+    assert len(input_label_dataset.tensors) == 3
+    assert_array_equal(input_label_dataset.tensors[-1].cpu().detach().numpy(), labels)
+
+
+def test_length_bucketing():
+
+    lengths = [3, 7, 2, 5, 7, 1]
+    input_ids = torch.zeros((6, 10), dtype=torch.long)
+    attention_mask = torch.zeros((6, 10), dtype=torch.long)
+    for i, length in enumerate(lengths):
+        input_ids[i, :length] = 1
+        attention_mask[i, :length] = 1
+    labels = np.arange(6)
+
+    dataset = input_labels_to_tensordataset(TensorDataset(input_ids, attention_mask), labels)
+
+    sampler = LengthBucketSampler(lengths, batch_size=2, shuffle=False)
+
+    batches = list(iter(sampler))
+    assert len(sampler) == 3
+    assert sorted(i for batch in batches for i in batch) == list(range(6))
+    # the first bucket holds the two longest sequences
+    assert sorted(batches[0]) == [1, 4]
+
+    dataloader = DataLoader(dataset, batch_sampler=sampler, collate_fn=collate_pad_to_batch_max_length)
+    for ids_batch, mask_batch, label_batch in dataloader:
+        # every batch is padded to its own maximum length only; labels are passed through untrimmed
+        assert ids_batch.shape[1] == mask_batch.sum(dim=1).max()
+        assert label_batch.shape == (2,)
\ No newline at end of file